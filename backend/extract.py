@@ -1,26 +1,82 @@
 import os
 import json
+import argparse
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from PyPDF2 import PdfReader
+from functools import lru_cache, partial
+import pymupdf
 from PIL import Image
-from PIL.ExifTags import TAGS
+from PIL.ExifTags import IFD, TAGS
 
-def get_file_info(file_path):
+try:
+    import pwd
+except ImportError:  # Not available on Windows
+    pwd = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# File extensions whose metadata is extracted in worker processes
+IMAGE_FILE_TYPES = (".jpg", ".jpeg", ".png")
+PARSED_FILE_TYPES = (".pdf",) + IMAGE_FILE_TYPES
+
+# Pillow formats handled by get_image_metadata
+IMAGE_FORMATS = ("JPEG", "PNG")
+
+# Seconds allowed for parsing the EXIF block of a single image
+EXIF_TIMEOUT = 5
+
+def dump_json(data):
+    """Serialize data to indented JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            # EXIF tags without a known name are kept as integer keys
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson rejects surrogate escapes, which os uses for non-UTF-8
+            # file names on POSIX; the stdlib encoder escapes them instead
+            pass
+    return json.dumps(data, indent=2).encode("utf-8")
+
+@lru_cache(maxsize=256)
+def _uid_to_user(uid):
+    """Resolve a user id to a login name, caching lookups since most files share an owner."""
+    if pwd is None:
+        return ""
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return ""
+
+def _file_extension(filename):
+    """Return the lowercased extension of a file name, matching os.path.splitext."""
+    index = filename.rfind(".")
+    if index <= 0 or not filename[:index].strip("."):
+        return ""
+    return filename[index:].lower()
+
+def get_file_info(file_path, stat=None, filename=None):
     """Extract basic file info using os.stat with a fallback for creation time."""
-    stat = os.stat(file_path)
+    if stat is None:
+        stat = os.stat(file_path)
+    if filename is None:
+        filename = os.path.basename(file_path)
     # Use st_birthtime if available (e.g., on macOS/BSD), otherwise use st_ctime
     creation_time = getattr(stat, 'st_birthtime', stat.st_ctime)
     
-    try:
-        import pwd
-        added_by = pwd.getpwuid(stat.st_uid).pw_name + "@example.com"
-    except Exception:
-        added_by = ""
+    user = _uid_to_user(stat.st_uid)
+    added_by = user + "@example.com" if user else ""
     
     file_info = {
-        "filename": os.path.basename(file_path),
+        "filename": filename,
         "file_path": file_path,
-        "file_type": os.path.splitext(file_path)[1].lower(),
+        "file_type": _file_extension(filename),
         "size": stat.st_size,
         "date_created": datetime.fromtimestamp(creation_time).isoformat(),
         "date_modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
@@ -30,78 +86,242 @@ def get_file_info(file_path):
     }
     return file_info
 
+def get_file_info_from_entry(entry):
+    """Extract basic file info from an os.DirEntry, reusing its cached stat."""
+    return get_file_info(entry.path, entry.stat(follow_symlinks=False), entry.name)
+
 def get_pdf_metadata(file_path):
-    """Extract PDF metadata using PyPDF2."""
+    """Extract PDF metadata using PyMuPDF."""
     metadata = {}
     try:
-        with open(file_path, "rb") as f:
-            reader = PdfReader(f)
-            metadata["page_count"] = len(reader.pages)
-            doc_info = reader.metadata
-            metadata["document_title"] = doc_info.title if doc_info and doc_info.title else ""
-            metadata["author"] = doc_info.author if doc_info and doc_info.author else ""
-            metadata["subject"] = doc_info.subject if doc_info and doc_info.subject else ""
-            keywords = doc_info.get("/Keywords", "") if doc_info else ""
+        with pymupdf.open(file_path) as doc:
+            doc_info = doc.metadata or {}
+            # MuPDF reads /Count from the page tree root without loading any
+            # page objects. It reports 0 rather than failing when that entry
+            # is missing, so check for it first and use None (JSON null) to
+            # mark the count as unknown; lookup errors on a damaged file must
+            # not discard the other fields.
+            try:
+                count_type, _ = doc.xref_get_key(doc.pdf_catalog(), "Pages/Count")
+                metadata["page_count"] = doc.page_count if count_type in ("int", "xref") else None
+            except Exception:
+                metadata["page_count"] = None
+            metadata["document_title"] = doc_info.get("title") or ""
+            metadata["author"] = doc_info.get("author") or ""
+            metadata["subject"] = doc_info.get("subject") or ""
+            keywords = doc_info.get("keywords") or ""
             metadata["keywords"] = [kw.strip() for kw in keywords.split(",")] if keywords else []
-            metadata["producer"] = doc_info.get("/Producer", "") if doc_info else ""
-            metadata["creation_date"] = doc_info.get("/CreationDate", "") if doc_info else ""
-            metadata["modification_date"] = doc_info.get("/ModDate", "") if doc_info else ""
-            # PDF version (if available)
-            metadata["pdf_version"] = reader.pdf_header_version if hasattr(reader, "pdf_header_version") else ""
-            # Additional keys not provided by PyPDF2; set defaults or leave empty
+            metadata["producer"] = doc_info.get("producer") or ""
+            metadata["creation_date"] = doc_info.get("creationDate") or ""
+            metadata["modification_date"] = doc_info.get("modDate") or ""
+            # PDF version from the header, reported by MuPDF as e.g. "PDF 1.7"
+            pdf_format = doc_info.get("format") or ""
+            metadata["pdf_version"] = pdf_format[4:] if pdf_format.startswith("PDF ") else ""
+            # Additional keys not provided by PyMuPDF; set defaults or leave empty
             metadata["font_usage"] = "Unknown"  # This detail isn't extracted
             metadata["color_profile"] = "sRGB"    # Default value; adjust as needed
-            metadata["tagged_pdf"] = False        # Not available via PyPDF2
-            metadata["encryption_status"] = "Encrypted" if reader.is_encrypted else "None"
+            metadata["tagged_pdf"] = False        # Not extracted
+            metadata["encryption_status"] = "Encrypted" if doc.is_encrypted else "None"
     except Exception as e:
         metadata = {}
     return metadata
 
-def get_image_metadata(file_path):
-    """Extract basic image metadata using Pillow."""
+@contextmanager
+def _time_limit(seconds):
+    """Raise TimeoutError if the block runs longer than seconds.
+
+    Uses SIGALRM, so the limit only applies on POSIX in the main thread
+    (which is where ProcessPoolExecutor workers run their tasks).
+    """
+    if not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _on_alarm(signum, frame):
+        raise TimeoutError(f"Timed out after {seconds} seconds")
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _read_exif(img):
+    """Return the EXIF tags of an open JPEG or MPO as a {tag name: value} dict."""
+    exif = {}
+    # getexif() caches the parsed IFD on the image object
+    exif_data = img.getexif()
+    for tag, value in exif_data.items():
+        exif[TAGS.get(tag, tag)] = value
+    # Merge the Exif sub-IFD and GPS data like _getexif() did
+    for tag, value in exif_data.get_ifd(IFD.Exif).items():
+        exif[TAGS.get(tag, tag)] = value
+    gps_info = exif_data.get_ifd(IFD.GPSInfo)
+    if gps_info:
+        exif["GPSInfo"] = gps_info
+    return exif
+
+def get_image_metadata(file_path, include_exif=True):
+    """Extract basic image metadata using Pillow.
+
+    With include_exif=False the EXIF block is not parsed at all and
+    "exif" is set to None; the same happens if parsing exceeds EXIF_TIMEOUT.
+    """
     metadata = {}
     try:
-        with Image.open(file_path) as img:
+        # Only header data is read below, so pixel data is never decoded.
+        # Restricting formats skips probing every other Pillow plugin.
+        with Image.open(file_path, formats=IMAGE_FORMATS) as img:
             metadata["dimensions"] = {"width": img.width, "height": img.height}
             metadata["color_mode"] = img.mode
             dpi = img.info.get("dpi", (0, 0))
             metadata["resolution"] = f"{dpi[0]} DPI" if dpi[0] else ""
-            # Extract EXIF data, if available
-            exif_data = img._getexif()
-            if exif_data:
+            # Extract EXIF data, if available. PNG files rarely carry EXIF and
+            # reading it would force a full decode, so only JPEGs are checked.
+            # JPEGs with a multi-picture (MPF) header, common from phones and
+            # cameras, are opened by Pillow as MPO and carry the same EXIF.
+            exif = None
+            if include_exif:
                 exif = {}
-                for tag, value in exif_data.items():
-                    tag_name = TAGS.get(tag, tag)
-                    exif[tag_name] = value
-                metadata["exif"] = exif
-            else:
-                metadata["exif"] = {}
+                if img.format in ("JPEG", "MPO"):
+                    # Malformed EXIF blocks can make parsing blow up in time and memory
+                    try:
+                        with _time_limit(EXIF_TIMEOUT):
+                            exif = _read_exif(img)
+                    except TimeoutError:
+                        exif = None
+            metadata["exif"] = exif
             metadata["ICC_profile"] = img.info.get("icc_profile", "")
     except Exception as e:
         metadata = {}
     return metadata
 
-def map_folder(folder_path):
-    """Recursively scan folder_path and map file details to a JSON-like structure."""
-    files_list = []
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            full_path = os.path.join(root, file)
-            file_data = get_file_info(full_path)
-            ext = file_data["file_type"]
-            if ext == ".pdf":
-                file_data["pdf_metadata"] = get_pdf_metadata(full_path)
-            elif ext in [".jpg", ".jpeg", ".png"]:
-                file_data["image_metadata"] = get_image_metadata(full_path)
-            files_list.append(file_data)
-    return {"files": files_list}
+def _iter_file_entries(folder_path):
+    """Recursively yield an os.DirEntry for every non-directory under folder_path.
+
+    Symlinked directories are not followed, which protects against link
+    cycles; symlinks to files are reported as entries of their own.
+    """
+    # Unreadable directories are skipped, as os.walk does
+    try:
+        with os.scandir(folder_path) as it:
+            entries = list(it)
+    except OSError:
+        return
+
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _iter_file_entries(entry.path)
+        elif not entry.is_dir():
+            # Everything os.walk lists as a file: files, links to files,
+            # broken links, FIFOs, ...
+            yield entry
+
+def _iter_file_info(folder_path):
+    """Recursively yield the basic file info for every file under folder_path.
+
+    On POSIX, os.fwalk provides a descriptor for each directory so files are
+    stat'ed relative to it instead of re-resolving the full path each time.
+    Elsewhere the os.scandir walk is used, whose entries carry stat data.
+    Symbolic links are reported with their own lstat data, and symlinked
+    directories are never descended into.
+    """
+    if hasattr(os, 'fwalk'):
+        for root, dirs, files, dirfd in os.fwalk(folder_path):
+            root_prefix = os.path.join(root, "")
+            for name in files:
+                try:
+                    stat = os.stat(name, dir_fd=dirfd, follow_symlinks=False)
+                except OSError:
+                    continue
+                yield get_file_info(root_prefix + name, stat, name)
+    else:
+        for entry in _iter_file_entries(folder_path):
+            try:
+                file_info = get_file_info_from_entry(entry)
+            except OSError:
+                continue
+            yield file_info
+
+def _process_one(file_data, include_exif=True):
+    """Add format-specific metadata to a file entry built by get_file_info."""
+    full_path = file_data["file_path"]
+    ext = file_data["file_type"]
+    if ext == ".pdf":
+        file_data["pdf_metadata"] = get_pdf_metadata(full_path)
+    elif ext in IMAGE_FILE_TYPES:
+        file_data["image_metadata"] = get_image_metadata(full_path, include_exif)
+    return file_data
+
+def map_folder(folder_path, max_workers=None, max_pending=1024, include_exif=True):
+    """Recursively scan folder_path and yield the file details one entry at a time.
+
+    PDFs and images are parsed in parallel worker processes, since that is
+    CPU-bound and independent per file; other files need no parsing and are
+    yielded as soon as they are found, so entries are not in walk order.
+    At most max_pending parses are in flight, which keeps memory bounded on
+    very large trees. Pass include_exif=False to skip EXIF parsing for images.
+    """
+    # Basic info is built here while walking, where stat data is cheapest,
+    # so workers never repeat the stat call
+    entries = _iter_file_info(folder_path)
+    process = partial(_process_one, include_exif=include_exif)
+
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, 8)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Results are yielded in submission order; the window of pending
+        # futures keeps the workers busy while earlier ones are drained
+        pending = deque()
+        for file_data in entries:
+            if file_data["file_type"] not in PARSED_FILE_TYPES:
+                yield file_data
+                continue
+            pending.append(executor.submit(process, file_data))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def write_mapping(files, outfile):
+    """Stream file entries to a binary file as a {"files": [...]} JSON document."""
+    outfile.write(b'{\n"files": [\n')
+    for index, file_data in enumerate(files):
+        if index:
+            outfile.write(b",\n")
+        outfile.write(dump_json(file_data))
+    outfile.write(b"\n]\n}\n")
+
+def save_mapping(files, output_file):
+    """Stream file entries to output_file, replacing it only once writing succeeds.
+
+    Entries go to a temporary file in the same directory, which is moved
+    over output_file at the end, so a failed or interrupted run leaves the
+    previous output untouched.
+    """
+    # A plain open() (rather than mkstemp) gives the file the usual umask permissions
+    temp_path = f"{output_file}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as outfile:
+            write_mapping(files, outfile)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
 
 if __name__ == "__main__":
-    folder_to_read = "./project"
-    mapping = map_folder(folder_to_read)
+    parser = argparse.ArgumentParser(description="Map the files in a folder and their metadata to JSON")
+    parser.add_argument("--folder", default="./project", help="Folder to scan (default: ./project)")
+    parser.add_argument("--output", default="output.json", help="Path of the JSON file to write (default: output.json)")
+    parser.add_argument("--no-exif", action="store_true", help="Don't parse EXIF data from images")
+    args = parser.parse_args()
     
-    output_file = "output.json"
-    with open(output_file, "w", encoding="utf-8") as outfile:
-        json.dump(mapping, outfile, indent=2)
+    output_file = args.output
+    save_mapping(map_folder(args.folder, include_exif=not args.no_exif), output_file)
     
     print(f"Mapping saved to {output_file}")
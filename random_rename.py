@@ -7,55 +7,155 @@ import time
 import json
 import sys
 import shutil
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The 260 character path limit only exists on Windows
+_NEEDS_LONG_PATH_CHECK = sys.platform == 'win32'
+
+# Number of output lines buffered before writing them to stdout
+OUTPUT_BATCH_SIZE = 1000
+
+# Character pools keyed by (use_letters, use_digits, use_special)
+_POOL_CACHE = {}
+
+def _get_char_pool(use_letters=True, use_digits=True, use_special=False):
+    """Return the characters allowed in random names, building each pool only once."""
+    key = (use_letters, use_digits, use_special)
+    pool = _POOL_CACHE.get(key)
+    if pool is None:
+        pool = ""
+        if use_letters:
+            pool += string.ascii_lowercase + string.ascii_uppercase
+        if use_digits:
+            pool += string.digits
+        if use_special:
+            pool += "!@#$%^&*()-_=+[]{}|;:,.<>?"
+        
+        # Ensure we have some characters to choose from
+        if not pool:
+            pool = string.ascii_lowercase + string.digits
+        _POOL_CACHE[key] = pool
+    return pool
 
 def generate_random_name(length=10, use_letters=True, use_digits=True, use_special=False):
     """Generate a random string of fixed length."""
-    chars = ""
-    if use_letters:
-        chars += string.ascii_lowercase + string.ascii_uppercase
-    if use_digits:
-        chars += string.digits
-    if use_special:
-        chars += "!@#$%^&*()-_=+[]{}|;:,.<>?"
-    
-    # Ensure we have some characters to choose from
-    if not chars:
-        chars = string.ascii_lowercase + string.digits
+    pool = _get_char_pool(use_letters, use_digits, use_special)
+    return ''.join(random.choices(pool, k=length))
+
+def dump_json(data):
+    """Serialize data to indented JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            # orjson rejects surrogate escapes, which os uses for non-UTF-8
+            # file names on POSIX; the stdlib encoder escapes them instead
+            pass
+    return json.dumps(data, indent=2).encode('utf-8')
+
+def compile_exclusions(options):
+    """
+    Precompute the exclusion checks so they cost O(1) per file.
     
-    return ''.join(random.choice(chars) for _ in range(length))
+    Args:
+        options (dict): Dictionary containing exclusion options
+        
+    Returns:
+        tuple: (frozenset of excluded extensions, compiled pattern regex or None)
+    """
+    exclude_extensions = frozenset(options.get('exclude_extensions', []))
+    patterns = options.get('exclude_patterns')
+    exclude_re = re.compile('|'.join(map(re.escape, patterns))) if patterns else None
+    return exclude_extensions, exclude_re
 
-def should_exclude_file(filename, script_path, options):
+def should_exclude_file(filename, script_path, options, exclusions=None, base_filename=None, extension=None):
     """
     Determine if a file should be excluded from renaming based on options.
     
     Args:
         filename (str): Full path to the file
-        script_path (str): Full path to this script
+        script_path (str): Full (absolute) path to this script
         options (dict): Dictionary containing exclusion options
+        exclusions (tuple): Result of compile_exclusions(options); computed if omitted
+        base_filename (str): Name of the file without path; derived if omitted
+        extension (str): Extension of the file as split_extension returns it; derived if omitted
         
     Returns:
         bool: True if the file should be excluded, False otherwise
     """
+    if exclusions is None:
+        exclusions = compile_exclusions(options)
+    exclude_extensions, exclude_re = exclusions
+    
     # Get just the filename without path
-    base_filename = os.path.basename(filename)
+    if base_filename is None:
+        base_filename = os.path.basename(filename)
     
-    # Exclude the script itself
-    if options.get('exclude_script', True) and os.path.abspath(filename) == script_path:
+    # Exclude the script itself. Only a file with the script's name can be the
+    # script, so the costly abspath is skipped for every other file.
+    if (options.get('exclude_script', True)
+            and script_path.endswith(os.sep + base_filename)
+            and os.path.abspath(filename) == script_path):
         return True
         
     # Check for excluded extensions
-    _, extension = os.path.splitext(base_filename)
-    if extension.lower() in options.get('exclude_extensions', []):
+    if extension is None:
+        _, extension = split_extension(base_filename)
+    if extension.lower() in exclude_extensions:
         return True
         
     # Check for excluded patterns
-    if options.get('exclude_patterns'):
-        for pattern in options['exclude_patterns']:
-            if pattern in base_filename:
-                return True
+    if exclude_re is not None and exclude_re.search(base_filename):
+        return True
                 
     return False
 
+def split_extension(filename):
+    """
+    Split a file name into (name, extension), matching os.path.splitext.
+    
+    Leading dots do not start an extension, so '.bashrc' has none.
+    """
+    index = filename.rfind('.')
+    if index <= 0 or not filename[:index].strip('.'):
+        return filename, ''
+    return filename[:index], filename[index:]
+
+def walk_file_entries(root_folder, rel_dir=''):
+    """
+    Walk a directory tree top-down like os.walk, without following symlinked folders.
+    
+    Args:
+        root_folder (str): The folder to walk
+        rel_dir (str): Path of root_folder relative to the top of the walk
+        
+    Yields:
+        tuple: (folder path, relative folder path, list of os.DirEntry for its files)
+    """
+    file_entries = []
+    subdirs = []
+    try:
+        with os.scandir(root_folder) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry)
+                else:
+                    file_entries.append(entry)
+    except OSError:
+        return
+    
+    yield root_folder, rel_dir, file_entries
+    
+    for entry in subdirs:
+        if not entry.is_symlink():
+            yield from walk_file_entries(entry.path, os.path.join(rel_dir, entry.name))
+
 def is_long_path(path):
     """Check if a path is close to or exceeds the Windows path length limit."""
     # Windows has a 260 character path length limitation by default
@@ -75,32 +175,44 @@ def safe_rename(old_path, new_path):
     """
     try:
         # Try direct renaming first
-        os.rename(old_path, new_path)
+        os.replace(old_path, new_path)
         return True
     except FileNotFoundError:
-        # For very long paths on Windows, we might need to use alternate methods
-        try:
-            # Try with \\?\ prefix for Windows long paths
-            if sys.platform == 'win32':
-                # This works on modern Windows to handle long paths
-                new_old_path = "\\\\?\\" + os.path.abspath(old_path)
-                new_new_path = "\\\\?\\" + os.path.abspath(new_path)
-                os.rename(new_old_path, new_new_path)
-                return True
-            else:
-                # Not a Windows system, so this shouldn't happen
-                return False
-        except Exception:
-            # If all else fails, try copy and delete approach
-            try:
-                shutil.copy2(old_path, new_path)
-                os.remove(old_path)
-                return True
-            except Exception:
-                return False
-    except Exception:
+        # Only very long paths on Windows can fail this way for an existing file
+        if not _NEEDS_LONG_PATH_CHECK:
+            return False
+    except OSError:
+        return False
+    
+    # Try with \\?\ prefix for Windows long paths
+    try:
+        # This works on modern Windows to handle long paths
+        long_old_path = "\\\\?\\" + os.path.abspath(old_path)
+        long_new_path = "\\\\?\\" + os.path.abspath(new_path)
+        os.replace(long_old_path, long_new_path)
+        return True
+    except OSError:
+        pass
+    
+    # If all else fails, try copy and delete approach
+    try:
+        shutil.copy2(old_path, new_path)
+        os.remove(old_path)
+        return True
+    except OSError:
         return False
 
+class RenameCounter:
+    """Statistics about a renaming operation, using plain attributes instead of dict lookups."""
+    __slots__ = ('total', 'renamed', 'skipped', 'errors')
+    
+    def __init__(self):
+        self.total = self.renamed = self.skipped = self.errors = 0
+    
+    def as_dict(self):
+        """Return the statistics as a dictionary."""
+        return {'total': self.total, 'renamed': self.renamed, 'skipped': self.skipped, 'errors': self.errors}
+
 def rename_files_recursively(root_folder, options):
     """
     Recursively rename all files in the given folder and its subfolders.
@@ -119,12 +231,12 @@ def rename_files_recursively(root_folder, options):
     # Get the full path to this script
     script_path = os.path.abspath(__file__)
     
+    # Build the exclusion checks once instead of per file
+    exclusions = compile_exclusions(options)
+    
     # Dictionary to store the mapping of old names to new names
     renamed_files = {}
     
-    # Set to keep track of already used random names (per directory)
-    used_names_by_dir = {}
-    
     # Prepare log file if needed
     if options.get('create_log', True):
         log_data = {
@@ -134,7 +246,7 @@ def rename_files_recursively(root_folder, options):
         }
     
     # Initialize counters for statistics
-    counter = {'total': 0, 'renamed': 0, 'skipped': 0, 'errors': 0}
+    counter = RenameCounter()
     
     # Enable long path support on Windows if possible
     if sys.platform == 'win32':
@@ -149,94 +261,131 @@ def rename_files_recursively(root_folder, options):
             print(f"Note: Could not enable Windows long path support. Error: {e}")
             print("Using alternative method for long paths.")
     
-    # Walk through directory tree
-    for current_dir, subdirs, files in os.walk(root_folder):
-        rel_dir = os.path.relpath(current_dir, root_folder)
-        dir_display = rel_dir if rel_dir != '.' else 'root directory'
-        print(f"\nProcessing {dir_display}...")
-        
-        # Create a set for used names in this directory
-        if current_dir not in used_names_by_dir:
-            used_names_by_dir[current_dir] = set()
-        
-        # Process files in the current directory
-        for filename in files:
-            counter['total'] += 1
-            file_path = os.path.join(current_dir, filename)
+    # Per-file output is buffered and written in batches rather than one
+    # print (and stdout lock/flush) per line
+    out_buf = []
+    
+    def write_line(line):
+        out_buf.append(line + "\n")
+        if len(out_buf) >= OUTPUT_BATCH_SIZE:
+            sys.stdout.write(''.join(out_buf))
+            out_buf.clear()
+    
+    try:
+        # Walk through directory tree and plan every rename up front. The plan
+        # keeps output lines and renames in walk order so they can be printed
+        # together once the renames are done.
+        plan = []
+        pending = []
+        for current_dir, rel_dir, file_entries in walk_file_entries(root_folder):
+            dir_display = rel_dir or 'root directory'
+            plan.append(f"\nProcessing {dir_display}...")
             
-            # Check if the file should be excluded
-            if should_exclude_file(file_path, script_path, options):
-                status = "Skipping"
-                new_name = "[excluded]"
-                counter['skipped'] += 1
-                print(f"{status}: {filename} {new_name}")
-                continue
+            # Path prefixes are built once per directory rather than joined per file
+            dir_prefix = os.path.join(current_dir, '')
+            rel_prefix = os.path.join(rel_dir, '') if rel_dir else ''
             
-            # Get the file extension
-            name_part, extension = os.path.splitext(filename)
+            # Names taken in this directory: its existing files plus the names
+            # already handed out. Targets in different directories cannot
+            # clash, so the set only lives for one directory.
+            used_names = {entry.name for entry in file_entries}
             
-            # Generate a unique random name
-            while True:
-                new_name = generate_random_name(
-                    length=options.get('name_length', 10),
-                    use_letters=options.get('use_letters', True),
-                    use_digits=options.get('use_digits', True),
-                    use_special=options.get('use_special', False)
-                ) + extension
+            # Process files in the current directory
+            for entry in file_entries:
+                counter.total += 1
+                filename = entry.name
+                old_path = entry.path
                 
-                if new_name not in used_names_by_dir[current_dir]:
-                    used_names_by_dir[current_dir].add(new_name)
-                    break
-            
-            # Full paths for old and new names
-            old_path = os.path.join(current_dir, filename)
-            new_path = os.path.join(current_dir, new_name)
-            
-            # Check for potential long path issues on Windows
-            if is_long_path(old_path) or is_long_path(new_path):
-                print(f"Warning: Path is very long and may cause issues: {old_path}")
-            
-            # Only perform actual renaming if not in dry run mode
-            success = True
-            if not options.get('dry_run', False):
-                success = safe_rename(old_path, new_path)
-                if success:
-                    status = "Renamed"
-                    counter['renamed'] += 1
-                else:
-                    status = "ERROR renaming"
-                    counter['errors'] += 1
-                    print(f"Failed to rename: {old_path}")
-                    print(f"Possible issues: Path too long or file in use")
+                # Check if the file should be excluded
+                # Get the file extension
+                name_part, extension = split_extension(filename)
+                
+                # Check if the file should be excluded
+                if should_exclude_file(old_path, script_path, options, exclusions, filename, extension):
+                    status = "Skipping"
+                    new_name = "[excluded]"
+                    counter.skipped += 1
+                    plan.append(f"{status}: {filename} {new_name}")
                     continue
-            else:
+                
+                # Generate a unique random name that doesn't clash with an existing file
+                while True:
+                    new_name = generate_random_name(
+                        length=options.get('name_length', 10),
+                        use_letters=options.get('use_letters', True),
+                        use_digits=options.get('use_digits', True),
+                        use_special=options.get('use_special', False)
+                    ) + extension
+                    if new_name not in used_names:
+                        used_names.add(new_name)
+                        break
+                new_path = dir_prefix + new_name
+                
+                # Check for potential long path issues on Windows
+                if _NEEDS_LONG_PATH_CHECK and (is_long_path(old_path) or is_long_path(new_path)):
+                    plan.append(f"Warning: Path is very long and may cause issues: {old_path}")
+                
+                rename = (old_path, new_path, rel_prefix + filename, rel_prefix + new_name)
+                plan.append(rename)
+                pending.append(rename)
+        
+        # Only perform actual renaming if not in dry run mode. os.rename releases
+        # the GIL, so the renames run concurrently on a thread pool; results are
+        # tallied and printed afterwards on the main thread, in walk order.
+        if options.get('dry_run', False):
+            results = [True] * len(pending)
+        else:
+            with ThreadPoolExecutor(max_workers=options.get('workers', 16)) as executor:
+                results = list(executor.map(lambda item: safe_rename(item[0], item[1]), pending))
+        
+        results = iter(results)
+        for item in plan:
+            if isinstance(item, str):
+                write_line(item)
+                continue
+            
+            old_path, new_path, rel_path, rel_new_path = item
+            success = next(results)
+            if options.get('dry_run', False):
                 status = "Would rename"
+            elif success:
+                status = "Renamed"
+                counter.renamed += 1
+            else:
+                status = "ERROR renaming"
+                counter.errors += 1
+                write_line(f"Failed to rename: {old_path}")
+                write_line(f"Possible issues: Path too long or file in use")
+                continue
             
             # Store the mapping
-            rel_path = os.path.relpath(old_path, root_folder)
-            rel_new_path = os.path.relpath(new_path, root_folder)
             renamed_files[rel_path] = rel_new_path
-            print(f"{status}: {rel_path} -> {rel_new_path}")
+            write_line(f"{status}: {rel_path} -> {rel_new_path}")
             
             # Add to log data
             if options.get('create_log', True):
                 log_data['files'][rel_path] = rel_new_path
+    finally:
+        sys.stdout.write(''.join(out_buf))
+        sys.stdout.flush()
     
     # Save log file if needed
     if options.get('create_log', True) and renamed_files and not options.get('dry_run', False):
         log_filename = os.path.join(root_folder, f"rename_log_{time.strftime('%Y%m%d_%H%M%S')}.json")
-        with open(log_filename, 'w') as f:
-            json.dump(log_data, f, indent=2)
+        # Serialize before opening so a failure cannot leave an empty log behind
+        log_bytes = dump_json(log_data)
+        with open(log_filename, 'wb') as f:
+            f.write(log_bytes)
         print(f"\nRename log saved to: {log_filename}")
     
     # Print summary
     print(f"\nSummary:")
-    print(f"  Total files found: {counter['total']}")
-    print(f"  Files renamed: {counter['renamed']}")
-    print(f"  Files skipped: {counter['skipped']}")
-    print(f"  Files with errors: {counter['errors']}")
+    print(f"  Total files found: {counter.total}")
+    print(f"  Files renamed: {counter.renamed}")
+    print(f"  Files skipped: {counter.skipped}")
+    print(f"  Files with errors: {counter.errors}")
     
-    return counter
+    return counter.as_dict()
 
 if __name__ == "__main__":
     # Set up command-line argument parsing
@@ -252,6 +401,7 @@ if __name__ == "__main__":
     parser.add_argument("--exclude", action="append", help="Exclude files containing these patterns (can be used multiple times)")
     parser.add_argument("--exclude-ext", action="append", help="Exclude files with these extensions (can be used multiple times)")
     parser.add_argument("--max-depth", type=int, help="Maximum depth of subdirectories to process (default: unlimited)")
+    parser.add_argument("--workers", type=int, default=16, help="Number of threads used to rename files (default: 16)")
     parser.add_argument("--short-name", action="store_true", help="Use shorter random names (5 chars) for long paths")
     
     # Parse arguments
@@ -275,6 +425,7 @@ if __name__ == "__main__":
             'create_log': not args.no_log,
             'exclude_script': not args.include_script,
             'max_depth': args.max_depth,
+            'workers': args.workers,
             'short_name': args.short_name
         }
         